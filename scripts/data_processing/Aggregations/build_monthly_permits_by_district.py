@@ -1,38 +1,77 @@
 #!/usr/bin/env python3
-"""Build monthly permit counts by BoroCD with real year-month timestamps."""
+"""Build monthly permit counts by BoroCD with real year-month timestamps.
+
+Set USE_POLARS=1 to run the aggregation through Polars' lazy streaming engine.
+"""
+
+import os
 
 import pandas as pd
 
 INPUT = "data/processed/permits_unified_with_district.parquet"
 OUTPUT_ALL = "data/processed/monthly_permits_by_district.parquet"
 OUTPUT_MODEL = "data/processed/monthly_permits_by_district_modeling.parquet"
+LOW_VOLUME_THRESHOLD = 5000
+
+
+def build_monthly_pandas():
+    df = pd.read_parquet(INPUT, columns=["BoroCD", "issued_date", "permit_id"])
+    df["issued_date"] = pd.to_datetime(df["issued_date"], errors="coerce")
+    df = df.dropna(subset=["issued_date", "BoroCD"])
+    # categorical key lets groupby hash integer codes instead of district values
+    df["BoroCD"] = df["BoroCD"].astype("category")
+
+    # true year-month
+    df["month"] = df["issued_date"].to_numpy().astype("datetime64[M]").astype("datetime64[ns]")
+
+    monthly = (
+        df.groupby(["BoroCD", "month"], observed=True, sort=False)["permit_id"]
+          .count()
+          .reset_index(name="permit_count")
+          .sort_values(["BoroCD", "month"])
+    )
+    monthly["BoroCD"] = monthly["BoroCD"].astype(monthly["BoroCD"].cat.categories.dtype)
+
+    monthly.to_parquet(OUTPUT_ALL, index=False)
+
+    # filter low-volume districts
+    keep = monthly.groupby("BoroCD")["permit_count"].sum() >= LOW_VOLUME_THRESHOLD
+
+    monthly_model = monthly[monthly["BoroCD"].map(keep).to_numpy(dtype=bool)].copy()
+    monthly_model.to_parquet(OUTPUT_MODEL, index=False)
+    return monthly.shape, monthly_model.shape
 
-df = pd.read_parquet(INPUT)
-df["issued_date"] = pd.to_datetime(df["issued_date"], errors="coerce")
-df = df.dropna(subset=["issued_date", "BoroCD"])
 
-# true year-month
-df["month"] = df["issued_date"].dt.to_period("M").dt.to_timestamp()
+def build_monthly_polars():
+    import polars as pl
 
-monthly = (
-    df.groupby(["BoroCD", "month"])["permit_id"]
-      .count()
-      .reset_index(name="permit_count")
-      .sort_values(["BoroCD", "month"])
-)
+    # the panel is small after aggregation, so collect once and write both outputs
+    monthly = (
+        pl.scan_parquet(INPUT)
+        .select(["BoroCD", "issued_date", "permit_id"])
+        .filter(pl.col("issued_date").is_not_null() & pl.col("BoroCD").is_not_null())
+        .group_by(
+            "BoroCD",
+            pl.col("issued_date").dt.truncate("1mo").cast(pl.Datetime("ns")).alias("month"),
+        )
+        .agg(pl.col("permit_id").count().cast(pl.Int64).alias("permit_count"))
+        .sort(["BoroCD", "month"])
+        .collect(engine="streaming")
+    )
+    monthly.write_parquet(OUTPUT_ALL)
 
-monthly.to_parquet(OUTPUT_ALL, index=False)
+    # filter low-volume districts
+    monthly_model = monthly.filter(
+        pl.col("permit_count").sum().over("BoroCD") >= LOW_VOLUME_THRESHOLD
+    )
+    monthly_model.write_parquet(OUTPUT_MODEL)
+    return monthly.shape, monthly_model.shape
 
-# filter low-volume districts
-low_volume = (
-    monthly.groupby("BoroCD")["permit_count"]
-    .sum()
-    .loc[lambda s: s < 5000]
-    .index
-)
 
-monthly_model = monthly[~monthly["BoroCD"].isin(low_volume)].copy()
-monthly_model.to_parquet(OUTPUT_MODEL, index=False)
+if os.environ.get("USE_POLARS") == "1":
+    all_shape, model_shape = build_monthly_polars()
+else:
+    all_shape, model_shape = build_monthly_pandas()
 
-print("all:", monthly.shape, "->", OUTPUT_ALL)
-print("model:", monthly_model.shape, "->", OUTPUT_MODEL)
+print("all:", all_shape, "->", OUTPUT_ALL)
+print("model:", model_shape, "->", OUTPUT_MODEL)
@@ -4,31 +4,37 @@
 import argparse
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 
-CANONICAL_COLUMNS = [
-    "source_system",
-    "permit_id",
-    "issued_date",
-    "filing_date",
-    "expiration_date",
-    "permit_status",
-    "job_type",
-    "work_type",
-    "borough",
-    "bin",
-    "block",
-    "lot",
-    "zip_code",
-    "latitude",
-    "longitude",
-    "community_board",
-    "council_district",
-    "census_tract",
-    "nta",
-    "estimated_job_cost",
-]
+CANONICAL_SCHEMA = pa.schema(
+    [
+        ("source_system", pa.string()),
+        ("permit_id", pa.string()),
+        ("issued_date", pa.timestamp("ns")),
+        ("filing_date", pa.timestamp("ns")),
+        ("expiration_date", pa.timestamp("ns")),
+        ("permit_status", pa.string()),
+        ("job_type", pa.string()),
+        ("work_type", pa.string()),
+        ("borough", pa.string()),
+        ("bin", pa.string()),
+        ("block", pa.string()),
+        ("lot", pa.string()),
+        ("zip_code", pa.string()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("community_board", pa.string()),
+        ("council_district", pa.float64()),
+        ("census_tract", pa.string()),
+        ("nta", pa.string()),
+        ("estimated_job_cost", pa.float64()),
+    ]
+)
 
 
 def parse_args() -> argparse.Namespace:
@@ -51,73 +57,152 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
-def parse_mixed_dates(series: pd.Series) -> pd.Series:
-    """Parse mixed dates from both API systems."""
-    s = series.astype("string").str.strip()
-    parsed_us = pd.to_datetime(s, format="%m/%d/%Y", errors="coerce")
-    parsed_iso = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
-    parsed_generic = pd.to_datetime(s, errors="coerce")
-    return parsed_us.fillna(parsed_iso).fillna(parsed_generic)
+def parse_mixed_dates(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Parse mixed dates from both API systems.
+
+    Columns already typed as timestamps by the ingest step are cast in Arrow.
+    Text dates repeat heavily across permits, so each distinct string is parsed
+    once and the result is mapped back onto the full column.
+    """
+    if pa.types.is_timestamp(column.type):
+        # ms values from the typed ingest can lie past 2262; null them before the ns cast
+        per_unit = {"s": 10**9, "ms": 10**6, "us": 10**3, "ns": 1}[column.type.unit]
+        bound = (2**63 - 1) // per_unit
+        ticks = pc.cast(column, pa.int64())
+        in_range = pc.and_(pc.greater_equal(ticks, -bound), pc.less_equal(ticks, bound))
+        in_range_only = pc.if_else(in_range, column, pa.scalar(None, column.type))
+        return pc.cast(in_range_only, pa.timestamp("ns"))
+    s = column.to_pandas().astype("string").str.strip()
+    uniq = pd.Series(s.dropna().unique())
+    if uniq.empty:
+        return pa.chunked_array([pa.nulls(len(column), pa.timestamp("ns"))])
+    parsed_us = pd.to_datetime(uniq, format="%m/%d/%Y", errors="coerce")
+    parsed_iso = pd.to_datetime(uniq, format="%Y-%m-%d", errors="coerce")
+    parsed_generic = pd.to_datetime(uniq, errors="coerce")
+    parsed = parsed_us.fillna(parsed_iso).fillna(parsed_generic)
+    # placeholders like 12/31/9999 fall outside datetime64[ns]: null them rather than fail the cast
+    parsed = parsed.where(parsed.between(pd.Timestamp.min, pd.Timestamp.max))
+    lookup = pd.Series(parsed.to_numpy(), index=uniq.to_numpy())
+    parsed_all = s.map(lookup).astype("datetime64[ns]")
+    return pa.chunked_array([pa.array(parsed_all, type=pa.timestamp("ns"), from_pandas=True)])
+
+
+def to_numeric(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    try:
+        return pc.cast(column, pa.float64())
+    except pa.ArrowInvalid:
+        # text with non-numeric entries: coerce those to null like pd.to_numeric
+        values = pd.to_numeric(column.to_pandas(), errors="coerce")
+        return pa.chunked_array([pa.array(values, type=pa.float64(), from_pandas=True)])
 
 
-def to_numeric(series: pd.Series) -> pd.Series:
-    return pd.to_numeric(series, errors="coerce")
+def as_canonical(columns: dict) -> pa.Table:
+    # cast per field: typed raw columns (e.g. numeric bin) become canonical strings
+    return pa.Table.from_arrays(
+        [pc.cast(columns[field.name], field.type) for field in CANONICAL_SCHEMA],
+        schema=CANONICAL_SCHEMA,
+    )
 
 
-def build_historical(df: pd.DataFrame) -> pd.DataFrame:
-    out = pd.DataFrame(
+def build_historical(table: pa.Table) -> pa.Table:
+    n = table.num_rows
+    return as_canonical(
         {
-            "source_system": "dob_historical",
-            "permit_id": df["permit_si_no"],
-            "issued_date": parse_mixed_dates(df["issuance_date"]),
-            "filing_date": parse_mixed_dates(df["filing_date"]),
-            "expiration_date": parse_mixed_dates(df["expiration_date"]),
-            "permit_status": df["permit_status"],
-            "job_type": df["job_type"],
-            "work_type": df["work_type"],
-            "borough": df["borough"],
-            "bin": df["bin__"],
-            "block": df["block"],
-            "lot": df["lot"],
-            "zip_code": df["zip_code"],
-            "latitude": to_numeric(df["gis_latitude"]),
-            "longitude": to_numeric(df["gis_longitude"]),
-            "community_board": df["community_board"],
-            "council_district": to_numeric(df["gis_council_district"]),
-            "census_tract": df["gis_census_tract"],
-            "nta": df["gis_nta_name"],
-            "estimated_job_cost": pd.NA,
+            "source_system": pa.repeat("dob_historical", n),
+            "permit_id": table["permit_si_no"],
+            "issued_date": parse_mixed_dates(table["issuance_date"]),
+            "filing_date": parse_mixed_dates(table["filing_date"]),
+            "expiration_date": parse_mixed_dates(table["expiration_date"]),
+            "permit_status": table["permit_status"],
+            "job_type": table["job_type"],
+            "work_type": table["work_type"],
+            "borough": table["borough"],
+            "bin": table["bin__"],
+            "block": table["block"],
+            "lot": table["lot"],
+            "zip_code": table["zip_code"],
+            "latitude": to_numeric(table["gis_latitude"]),
+            "longitude": to_numeric(table["gis_longitude"]),
+            "community_board": table["community_board"],
+            "council_district": to_numeric(table["gis_council_district"]),
+            "census_tract": table["gis_census_tract"],
+            "nta": table["gis_nta_name"],
+            "estimated_job_cost": pa.nulls(n, pa.float64()),
         }
     )
-    return out[CANONICAL_COLUMNS]
 
 
-def build_dob_now(df: pd.DataFrame) -> pd.DataFrame:
-    out = pd.DataFrame(
+def build_dob_now(table: pa.Table) -> pa.Table:
+    n = table.num_rows
+    return as_canonical(
         {
-            "source_system": "dob_now",
-            "permit_id": df["job_filing_number"],
-            "issued_date": parse_mixed_dates(df["issued_date"]),
-            "filing_date": pd.NaT,
-            "expiration_date": parse_mixed_dates(df["expired_date"]),
-            "permit_status": df["permit_status"],
-            "job_type": pd.NA,
-            "work_type": df["work_type"],
-            "borough": df["borough"],
-            "bin": df["bin"],
-            "block": df["block"],
-            "lot": df["lot"],
-            "zip_code": df["zip_code"],
-            "latitude": to_numeric(df["latitude"]),
-            "longitude": to_numeric(df["longitude"]),
-            "community_board": df["community_board"],
-            "council_district": to_numeric(df["council_district"]),
-            "census_tract": df["census_tract"],
-            "nta": df["nta"],
-            "estimated_job_cost": to_numeric(df["estimated_job_costs"]),
+            "source_system": pa.repeat("dob_now", n),
+            "permit_id": table["job_filing_number"],
+            "issued_date": parse_mixed_dates(table["issued_date"]),
+            "filing_date": pa.nulls(n, pa.timestamp("ns")),
+            "expiration_date": parse_mixed_dates(table["expired_date"]),
+            "permit_status": table["permit_status"],
+            "job_type": pa.nulls(n, pa.string()),
+            "work_type": table["work_type"],
+            "borough": table["borough"],
+            "bin": table["bin"],
+            "block": table["block"],
+            "lot": table["lot"],
+            "zip_code": table["zip_code"],
+            "latitude": to_numeric(table["latitude"]),
+            "longitude": to_numeric(table["longitude"]),
+            "community_board": table["community_board"],
+            "council_district": to_numeric(table["council_district"]),
+            "census_tract": table["census_tract"],
+            "nta": table["nta"],
+            "estimated_job_cost": to_numeric(table["estimated_job_costs"]),
         }
     )
-    return out[CANONICAL_COLUMNS]
+
+
+def count_cross_system_collisions(permits: pa.Table) -> int:
+    """Count 2016-2019 (rounded location, issue day) keys seen in both systems.
+
+    Keys are packed into one int64 and grouped by sort + run boundaries rather
+    than a multi-column hash groupby.
+    """
+    issued = permits["issued_date"]
+    keep = pc.and_(
+        pc.and_(
+            pc.greater_equal(issued, pa.scalar(pd.Timestamp("2016-01-01"), type=issued.type)),
+            pc.less_equal(issued, pa.scalar(pd.Timestamp("2019-12-31"), type=issued.type)),
+        ),
+        pc.and_(pc.is_valid(permits["latitude"]), pc.is_valid(permits["longitude"])),
+    )
+    overlap = (
+        permits.select(["source_system", "latitude", "longitude", "issued_date"])
+        .filter(keep)
+        .to_pandas()
+    )
+    if overlap.empty:
+        return 0
+
+    lat = np.round(overlap["latitude"].to_numpy() * 1e5).astype(np.int64)
+    lon = np.round(overlap["longitude"].to_numpy() * 1e5).astype(np.int64)
+    day = overlap["issued_date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    src = pd.factorize(overlap["source_system"])[0]
+
+    # mixed-radix packing; spans are bounded by the coordinate ranges and the
+    # four-year window, so the product stays well inside int64
+    lat -= lat.min()
+    lon -= lon.min()
+    day -= day.min()
+    lon_span = int(lon.max()) + 1
+    day_span = int(day.max()) + 1
+    key = (lat * lon_span + lon) * day_span + day
+
+    order = np.lexsort((src, key))
+    key = key[order]
+    src = src[order]
+    new_key = np.r_[True, key[1:] != key[:-1]]
+    new_pair = new_key | np.r_[True, src[1:] != src[:-1]]
+    n_sources = np.add.reduceat(new_pair.astype(np.int64), np.flatnonzero(new_key))
+    return int((n_sources > 1).sum())
 
 
 def main() -> None:
@@ -163,38 +248,28 @@ def main() -> None:
         "estimated_job_costs",
     ]
 
-    hist_raw = pd.read_parquet(args.historical_input, columns=hist_cols)
-    now_raw = pd.read_parquet(args.dob_now_input, columns=now_cols)
+    hist_raw = pq.read_table(args.historical_input, columns=hist_cols)
+    now_raw = pq.read_table(args.dob_now_input, columns=now_cols)
 
     hist = build_historical(hist_raw)
     now = build_dob_now(now_raw)
-    permits = pd.concat([hist, now], ignore_index=True)
+    # both sides share CANONICAL_SCHEMA, so the union only concatenates column chunks
+    permits = pa.concat_tables([hist, now])
 
     # Requested quick overlap diagnostic (do NOT dedupe yet)
-    permits["lat_r"] = permits["latitude"].round(5)
-    permits["lon_r"] = permits["longitude"].round(5)
-    permits["issue_day"] = permits["issued_date"].dt.floor("D")
+    print("cross-system collisions:", count_cross_system_collisions(permits))
 
-    overlap = permits[
-        (permits["issued_date"] >= "2016-01-01") & (permits["issued_date"] <= "2019-12-31")
-    ]
-    collisions = (
-        overlap.groupby(["lat_r", "lon_r", "issue_day"])
-        .agg(n=("source_system", "size"), n_sources=("source_system", "nunique"))
-        .reset_index()
-    )
-    cross_system = collisions[collisions["n_sources"] > 1]
-    print("cross-system collisions:", len(cross_system))
+    # borough-contiguous, date-ordered rows give downstream readers tight row-group stats
+    permits = permits.sort_by([("borough", "ascending"), ("issued_date", "ascending")])
 
-    permits = permits[CANONICAL_COLUMNS]
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    permits.to_parquet(output_path, index=False)
+    pq.write_table(permits, str(output_path), row_group_size=500_000)
 
     print(f"wrote unified permits: {output_path}")
-    print(f"rows: {len(permits):,}")
+    print(f"rows: {permits.num_rows:,}")
     print("rows by source:")
-    print(permits["source_system"].value_counts(dropna=False))
+    print(permits["source_system"].to_pandas().rename("source_system").value_counts(dropna=False))
 
 
 if __name__ == "__main__":
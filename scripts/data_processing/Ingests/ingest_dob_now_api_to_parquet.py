@@ -2,23 +2,39 @@
 """Fetch DOB NOW: Build - Approved Permits (rbx6-tga4) to raw Parquet."""
 
 import argparse
-import json
 import os
+import shutil
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 
+import orjson
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
 
 
 DATASET_ID = "rbx6-tga4"
 VIEW_URL = f"https://data.cityofnewyork.us/api/views/{DATASET_ID}.json"
 DATA_URL = f"https://data.cityofnewyork.us/resource/{DATASET_ID}.json"
+# Socrata dataTypeName -> Arrow type; anything unlisted is kept as a string
+SOCRATA_ARROW_TYPES = {
+    "number": pa.float64(),
+    "calendar_date": pa.timestamp("ms"),
+}
 REQUIRED_FIELDS = ["job_filing_number", "issued_date", "latitude", "longitude", "bin"]
+DATE_FIELD = "issued_date"
+MONTH_PARTITIONING = ds.partitioning(
+    pa.schema([("year", pa.int16()), ("month", pa.int8())]), flavor="hive"
+)
+PARTITION_MIN_ROWS_PER_GROUP = 50_000
+PARTITION_MAX_ROWS_PER_GROUP = 500_000
 
 
 def parse_args() -> argparse.Namespace:
@@ -58,6 +74,23 @@ def parse_args() -> argparse.Namespace:
         default=5,
         help="Retries per request (default: 5)",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Pages fetched concurrently (default: 4)",
+    )
+    parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="Write a hive-partitioned dataset directory (year=/month=) instead of one file",
+    )
+    parser.add_argument(
+        "--pages-per-write",
+        type=int,
+        default=20,
+        help="Pages buffered per partitioned dataset write (default: 20)",
+    )
     parser.add_argument(
         "--start-offset",
         type=int,
@@ -83,14 +116,18 @@ def http_get_json(
         req.add_header("X-App-Token", app_token)
 
     with urlopen(req, timeout=timeout) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+        return orjson.loads(resp.read())
 
 
-def get_dataset_columns(app_token: Optional[str], retries: int) -> List[str]:
+def get_dataset_columns(app_token: Optional[str], retries: int) -> Dict[str, str]:
     for attempt in range(1, retries + 1):
         try:
             payload = http_get_json(VIEW_URL, app_token=app_token, timeout=60)
-            columns = [c["fieldName"] for c in payload.get("columns", []) if c.get("fieldName")]
+            columns = {
+                c["fieldName"]: c.get("dataTypeName", "text")
+                for c in payload.get("columns", [])
+                if c.get("fieldName")
+            }
             if not columns:
                 raise RuntimeError("No columns discovered from dataset metadata.")
             return columns
@@ -128,78 +165,185 @@ def fetch_page(
     return []
 
 
-def normalize_rows(records: List[Dict], columns: List[str]) -> List[Dict]:
-    return [{column: record.get(column) for column in columns} for record in records]
+def iter_pages(
+    fetch: Callable[[int], List[Dict]],
+    start_offset: int,
+    limit: int,
+    max_pages: Optional[int],
+    workers: int,
+) -> Iterator[Tuple[int, int, List[Dict]]]:
+    """Yield (page_num, offset, rows) in order while up to `workers` pages are in flight."""
+    pending: Deque = deque()
+    page_num = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                while len(pending) < workers and (max_pages is None or page_num < max_pages):
+                    offset = start_offset + page_num * limit
+                    page_num += 1
+                    pending.append((page_num, offset, pool.submit(fetch, offset)))
+                if not pending:
+                    return
+
+                num, offset, future = pending.popleft()
+                rows = future.result()
+                yield num, offset, rows
+                if len(rows) < limit:
+                    return
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+
+
+def records_to_table(records: List[Dict], schema: pa.Schema) -> pa.Table:
+    """Build a table column-first: one list per field instead of one dict per row."""
+    arrays = [
+        pa.array([record.get(field.name) for record in records], type=field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def add_month_partitions(table: pa.Table, date_field: str) -> pa.Table:
+    """Append year/month partition columns derived from `date_field`."""
+    dates = table[date_field]
+    if not pa.types.is_timestamp(dates.type):
+        # text-typed date field: try US MM/DD/YYYY, then the ISO date prefix
+        text = pc.utf8_trim_whitespace(dates)
+        dates = pc.coalesce(
+            pc.strptime(text, format="%m/%d/%Y", unit="ms", error_is_null=True),
+            pc.strptime(
+                pc.utf8_slice_codeunits(text, 0, 10),
+                format="%Y-%m-%d",
+                unit="ms",
+                error_is_null=True,
+            ),
+        )
+        unparsed = pc.sum(pc.and_(pc.is_valid(text), pc.is_null(dates))).as_py() or 0
+        if unparsed:
+            print(f"warning: {unparsed} unparsed {date_field} values go to the default partition")
+    return table.append_column("year", pc.cast(pc.year(dates), pa.int16())).append_column(
+        "month", pc.cast(pc.month(dates), pa.int8())
+    )
+
 
 
+def write_month_partitions(
+    tables: List[pa.Table], output_path: Path, first_offset: int
+) -> None:
+    """Write buffered pages in one dataset pass: one file per month per flush, not per page."""
+    ds.write_dataset(
+        pa.concat_tables(tables),
+        str(output_path),
+        format="parquet",
+        partitioning=MONTH_PARTITIONING,
+        basename_template=f"part-{first_offset}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        min_rows_per_group=PARTITION_MIN_ROWS_PER_GROUP,
+        max_rows_per_group=PARTITION_MAX_ROWS_PER_GROUP,
+        file_options=ds.ParquetFileFormat().make_write_options(
+            compression="zstd", compression_level=3
+        ),
+    )
+
 def main() -> None:
     args = parse_args()
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     if output_path.exists() and args.start_offset == 0:
-        output_path.unlink()
-    if output_path.exists() and args.start_offset > 0:
+        # only a partitioned run owns a whole directory; otherwise keep the old unlink/refuse
+        if args.partitioned and output_path.is_dir():
+            shutil.rmtree(output_path)
+        else:
+            output_path.unlink()
+    # partitioned resumes add new part files keyed by offset, so the directory may exist
+    if output_path.exists() and args.start_offset > 0 and not args.partitioned:
         raise RuntimeError(
             "Output file already exists for resume mode. "
             "Use a different --output path for resumed ingest."
         )
 
     app_token = os.environ.get(args.app_token_env)
-    columns = get_dataset_columns(app_token=app_token, retries=args.retries)
+    column_types = get_dataset_columns(app_token=app_token, retries=args.retries)
     for field in REQUIRED_FIELDS:
-        if field not in columns:
-            columns.append(field)
+        column_types.setdefault(field, "text")
+    columns = list(column_types)
 
     print(f"dataset_id: {DATASET_ID}")
     print(f"columns discovered: {len(columns)}")
     print(f"required fields: {', '.join(REQUIRED_FIELDS)}")
     print(f"output: {output_path}")
     print(f"limit: {args.limit}")
+    print(f"workers: {args.workers}")
 
     writer = None
+    pending: List[pa.Table] = []
+    pending_offset = args.start_offset
     total_rows = 0
-    offset = args.start_offset
-    page_num = 0
-    fixed_schema = pa.schema([(column, pa.string()) for column in columns])
+    # Socrata returns every value as a JSON string; cast to typed columns per page
+    raw_schema = pa.schema([(column, pa.string()) for column in columns])
+    typed_schema = pa.schema(
+        [
+            (column, SOCRATA_ARROW_TYPES.get(type_name, pa.string()))
+            for column, type_name in column_types.items()
+        ]
+    )
 
-    try:
-        while True:
-            page_num += 1
-            if args.max_pages is not None and page_num > args.max_pages:
-                break
+    def fetch(offset: int) -> List[Dict]:
+        return fetch_page(
+            app_token=app_token,
+            columns=columns,
+            limit=args.limit,
+            offset=offset,
+            where_clause=args.where,
+            retries=args.retries,
+        )
 
-            rows = fetch_page(
-                app_token=app_token,
-                columns=columns,
-                limit=args.limit,
-                offset=offset,
-                where_clause=args.where,
-                retries=args.retries,
-            )
+    try:
+        for page_num, offset, rows in iter_pages(
+            fetch,
+            start_offset=args.start_offset,
+            limit=args.limit,
+            max_pages=args.max_pages,
+            workers=args.workers,
+        ):
             if not rows:
                 break
 
-            batch_rows = normalize_rows(rows, columns)
-            table = pa.Table.from_pylist(batch_rows, schema=fixed_schema)
-            if writer is None:
-                writer = pq.ParquetWriter(str(output_path), table.schema)
-            writer.write_table(table)
+            # projects each record onto `columns`; missing keys become nulls
+            table = records_to_table(rows, raw_schema).cast(typed_schema)
+            if args.partitioned:
+                # pages arrive in :id order and each spans many months; batching them
+                # keeps the file count per month down to one per flush
+                if not pending:
+                    pending_offset = offset
+                pending.append(add_month_partitions(table, DATE_FIELD))
+                if len(pending) >= args.pages_per_write:
+                    write_month_partitions(pending, output_path, pending_offset)
+                    pending = []
+            else:
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        str(output_path),
+                        table.schema,
+                        compression="zstd",
+                        compression_level=3,
+                    )
+                writer.write_table(table)
 
-            batch_size = len(batch_rows)
+            batch_size = len(rows)
             total_rows += batch_size
             print(
                 f"page {page_num}: fetched {batch_size:,} rows "
                 f"(session total {total_rows:,}, offset {offset:,})"
             )
-
-            if batch_size < args.limit:
-                break
-            offset += args.limit
     finally:
+        if pending:
+            write_month_partitions(pending, output_path, pending_offset)
         if writer is not None:
             writer.close()
 
-    if writer is None:
+    if total_rows == 0:
         raise RuntimeError("No rows fetched. Parquet file was not created.")
 
     print(f"done: wrote {total_rows:,} rows to {output_path}")
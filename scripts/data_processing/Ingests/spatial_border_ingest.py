@@ -1,5 +1,8 @@
 import geopandas as gp
+import numpy as np
 import pandas as pd
+import shapely
+import pyarrow.dataset as ds
 
 # Paths
 POLY_PATH = "data/raw/nycd_25d/nycd.shp"
@@ -11,23 +14,29 @@ polys = gp.read_file(POLY_PATH)
 polys = polys.to_crs("EPSG:4326")
 polys = polys[["BoroCD", "geometry"]].copy()
 
-# Load permits (lat/lon in WGS84)
-permits = pd.read_parquet(PERMITS_PATH)
-permits = permits.copy()
-permits = permits[permits["latitude"].notna() & permits["longitude"].notna()].copy()
-
-# Build points GeoDataFrame
-gdf = gp.GeoDataFrame(
-    permits,
-    geometry=gp.points_from_xy(permits["longitude"], permits["latitude"]),
-    crs="EPSG:4326",
+# Load permits (lat/lon in WGS84); null coordinates are dropped at scan time
+permits = (
+    ds.dataset(PERMITS_PATH, format="parquet")
+    .to_table(filter=ds.field("latitude").is_valid() & ds.field("longitude").is_valid())
+    .to_pandas(split_blocks=True)
 )
 
-# Spatial join to assign community district
-joined = gp.sjoin(gdf, polys, how="left", predicate="within")
+# Build point geometries in one vectorized call
+points = shapely.points(permits["longitude"].to_numpy(), permits["latitude"].to_numpy())
+
+# Bulk STRtree query to assign community district (point within polygon)
+idx_permit, idx_poly = polys.sindex.query(points, predicate="within")
+# keep the first match for a point that falls inside more than one polygon
+idx_permit, first = np.unique(idx_permit, return_index=True)
+idx_poly = idx_poly[first]
+
+out = permits
+out["BoroCD"] = (
+    pd.Series(polys["BoroCD"].to_numpy()[idx_poly], index=permits.index[idx_permit])
+    .reindex(permits.index)
+)
 
-# Write back to parquet (drop geometry/index columns)
-out = joined.drop(columns=["geometry", "index_right"])
+# Write back to parquet
 out.to_parquet(OUTPUT_PATH, index=False)
 
 print("polygons:", polys.shape, "crs:", polys.crs)
@@ -1,6 +1,6 @@
 import pandas as pd
 
 
-df = pd.read_parquet("data/processed/permits_unified.parquet")
+df = pd.read_parquet("data/processed/permits_unified.parquet", columns=["job_type", "work_type"])
 print(df.groupby(["job_type"], dropna=False).size())
 print("----------------",df.groupby(["work_type"], dropna=False).size())
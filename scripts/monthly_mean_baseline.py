@@ -17,56 +17,62 @@ df["month"] = pd.to_datetime(df["month"])
 
 # Determine last complete month from dataset
 max_date = df["month"].max()
-max_month_start = max_date.to_period("M").to_timestamp()
+max_month_start = pd.Timestamp(max_date.to_datetime64().astype("datetime64[M]"))
 max_month_end = max_month_start + pd.offsets.MonthEnd(0)
 last_complete_month = max_month_start - pd.DateOffset(months=1) if max_date < max_month_end else max_month_start
 
 df = df[df["month"] <= last_complete_month].copy()
 
-def metrics(d: pd.DataFrame):
-    y = d["y_true"].to_numpy(float)
-    p = d["pred"].to_numpy(float)
-    mae = np.mean(np.abs(y - p))
-    smape = np.mean(2 * np.abs(p - y) / (np.abs(p) + np.abs(y) + 1e-8))
-    return mae, smape
+holdout_start = last_complete_month - pd.DateOffset(months=11)
 
-rows = []
+# One sorted frame; rolling + shift run per district without a Python loop
+df = df.sort_values(["BoroCD", "month"]).reset_index(drop=True)
+roll12 = (
+    df.groupby("BoroCD")["permits"]
+    .rolling(window=12, min_periods=12)
+    .mean()
+    .reset_index(level=0, drop=True)
+)
+df["pred"] = roll12.groupby(df["BoroCD"]).shift(1)
 
-for boro, g in df.groupby("BoroCD"):
-    g = g.sort_values("month").copy()
-    g["roll12"] = g["permits"].rolling(window=12, min_periods=12).mean()
-    g["pred"] = g["roll12"].shift(1)
-    eval_df = g.dropna(subset=["pred"]).copy()
-    eval_df["y_true"] = eval_df["permits"]
-    if eval_df.empty:
-        continue
+eval_df = df.dropna(subset=["pred"])
+y = eval_df["permits"].to_numpy(float)
+p = eval_df["pred"].to_numpy(float)
+is_val = (eval_df["month"] >= holdout_start).to_numpy()
 
-    holdout_start = last_complete_month - pd.DateOffset(months=11)
-    train_eval = eval_df[eval_df["month"] < holdout_start]
-    val_eval = eval_df[eval_df["month"] >= holdout_start]
+# group code = district * 2 + split (0 = train, 1 = val)
+boro_codes, boros = pd.factorize(eval_df["BoroCD"], sort=True)
+codes = boro_codes * 2 + is_val.astype(np.int64)
+# one bincount pass per statistic; weights carry the per-row error terms
+n_groups = 2 * len(boros)
+abs_err = np.abs(p - y)
+abs_sum = np.bincount(codes, weights=abs_err, minlength=n_groups)
+smape_sum = np.bincount(codes, weights=2 * abs_err / (np.abs(p) + np.abs(y) + 1e-8), minlength=n_groups)
+counts = np.bincount(codes, minlength=n_groups)
+abs_sum, smape_sum, counts = (a.reshape(-1, 2) for a in (abs_sum, smape_sum, counts))
 
-    mae_all, smape_all = metrics(eval_df)
-    mae_tr, smape_tr = metrics(train_eval) if len(train_eval) else (np.nan, np.nan)
-    mae_va, smape_va = metrics(val_eval) if len(val_eval) else (np.nan, np.nan)
-
-    rows.append({
-        "BoroCD": boro,
-        "mae_all": mae_all,
-        "smape_all": smape_all,
-        "mae_train": mae_tr,
-        "smape_train": smape_tr,
-        "mae_val": mae_va,
-        "smape_val": smape_va,
-        "n_train": len(train_eval),
-        "n_val": len(val_eval),
-        "n_eval": len(eval_df),
+with np.errstate(invalid="ignore", divide="ignore"):
+    n_all = counts.sum(axis=1)
+    split_mae = abs_sum / counts
+    split_smape = smape_sum / counts
+    rows = pd.DataFrame({
+        "BoroCD": boros,
+        "mae_all": abs_sum.sum(axis=1) / n_all,
+        "smape_all": smape_sum.sum(axis=1) / n_all,
+        "mae_train": split_mae[:, 0],
+        "smape_train": split_smape[:, 0],
+        "mae_val": split_mae[:, 1],
+        "smape_val": split_smape[:, 1],
+        "n_train": counts[:, 0],
+        "n_val": counts[:, 1],
+        "n_eval": n_all,
     })
 
-if not rows:
+if rows.empty:
     print("No districts had enough history for a 12-month rolling baseline.")
     print("Last complete month:", last_complete_month)
 else:
-    results = pd.DataFrame(rows).sort_values("BoroCD")
+    results = rows.sort_values("BoroCD")
     avg_mae = results["mae_val"].mean()
     avg_smape = results["smape_val"].mean()
     print("Last complete month:", last_complete_month)
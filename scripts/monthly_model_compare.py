@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """SARIMA baseline per district (1-month targets, 12-month holdout)."""
 
-import warnings
 import pandas as pd
 import numpy as np
+from joblib import Parallel, delayed
 from statsmodels.tsa.statespace.sarimax import SARIMAX
 
 
@@ -38,7 +38,8 @@ def make_full_month_index(df):
     return out.reset_index()
 
 
-def choose_sarima_order(train_series):
+def choose_sarima_order(train_values):
+    """AIC grid search; returns ((order, seasonal_order), fitted results) or None."""
     orders = [(0, 1, 1), (1, 1, 0), (1, 1, 1)]
     seas = [
         (0, 1, 1, SEASONAL_PERIODS),
@@ -51,7 +52,7 @@ def choose_sarima_order(train_series):
         for s in seas:
             try:
                 model = SARIMAX(
-                    train_series,
+                    train_values,
                     order=o,
                     seasonal_order=s,
                     enforce_stationarity=False,
@@ -60,66 +61,58 @@ def choose_sarima_order(train_series):
                 res = model.fit(disp=False)
                 if res.aic < best_aic:
                     best_aic = res.aic
-                    best = (o, s)
+                    best = ((o, s), res)
             except Exception:
                 continue
     return best
 
 
 def sarima_forecast(train, steps):
-    order = choose_sarima_order(train)
-    if order is None:
-        return pd.Series([np.nan] * steps, index=pd.RangeIndex(steps))
-    o, s = order
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        model = SARIMAX(
-            train,
-            order=o,
-            seasonal_order=s,
-            enforce_stationarity=False,
-            enforce_invertibility=False,
-        )
-        res = model.fit(disp=False)
-        return res.forecast(steps)
+    # one float64 array shared by every grid fit; the winning fit is reused for the forecast
+    train_values = np.asarray(train, dtype=np.float64)
+    best = choose_sarima_order(train_values)
+    if best is None:
+        return np.full(steps, np.nan)
+    _, res = best
+    return res.forecast(steps)
 
 
-def main():
-    warnings.filterwarnings(
-        "ignore",
-        message="No frequency information was provided, so inferred frequency MS will be used.",
-        category=Warning,
-    )
+def _fit_one(boro, g):
+    g = g.sort_values("month")
+    g = make_full_month_index(g)
 
-    df = pd.read_parquet(INPUT).rename(columns={"permit_count": "permits"})
-    df["month"] = pd.to_datetime(df["month"])
+    last_complete = g["month"].max()
+    holdout_start = last_complete - pd.DateOffset(months=HOLDOUT_MONTHS - 1)
 
-    results = []
+    series = g.set_index("month")
+    actual = series.loc[holdout_start:last_complete, "permits"]
+    if len(actual) < HOLDOUT_MONTHS:
+        return None
 
-    for boro, g in df.groupby("BoroCD"):
-        g = g.sort_values("month")
-        g = make_full_month_index(g)
+    train = series.loc[:(holdout_start - pd.DateOffset(months=1)), "permits"]
+    if len(train) < SEASONAL_PERIODS * 2:
+        return None
 
-        last_complete = g["month"].max()
-        holdout_start = last_complete - pd.DateOffset(months=HOLDOUT_MONTHS - 1)
+    pred = sarima_forecast(train, HOLDOUT_MONTHS)
+    pred = pd.Series(np.asarray(pred), index=actual.index)
 
-        series = g.set_index("month")
-        actual = series.loc[holdout_start:last_complete, "permits"]
-        if len(actual) < HOLDOUT_MONTHS:
-            continue
+    return {
+        "BoroCD": boro,
+        "mae_sarima": mae(actual, pred),
+        "smape_sarima": smape(actual, pred),
+    }
 
-        train = series.loc[:(holdout_start - pd.DateOffset(months=1)), "permits"]
-        if len(train) < SEASONAL_PERIODS * 2:
-            continue
 
-        pred = sarima_forecast(train, HOLDOUT_MONTHS)
-        pred = pd.Series(pred.values, index=actual.index)
+def main():
+    df = pd.read_parquet(INPUT).rename(columns={"permit_count": "permits"})
+    df["month"] = pd.to_datetime(df["month"])
 
-        results.append({
-            "BoroCD": boro,
-            "mae_sarima": mae(actual, pred),
-            "smape_sarima": smape(actual, pred),
-        })
+    # split up front so each worker only receives its own district
+    groups = [(boro, g.copy()) for boro, g in df.groupby("BoroCD")]
+    results = Parallel(n_jobs=-1, backend="loky")(
+        delayed(_fit_one)(boro, g) for boro, g in groups
+    )
+    results = [r for r in results if r is not None]
 
     res = pd.DataFrame(results).sort_values("BoroCD")
     print("districts:", len(res))
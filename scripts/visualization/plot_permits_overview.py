@@ -1,55 +1,188 @@
 #!/usr/bin/env python3
 """Simple monthly volume plot from unified permits."""
 
+import numpy as np
 import pandas as pd
+import matplotlib
+
+matplotlib.use("Agg")  # PNG output only; skip GUI backend probing
+import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from numba import njit
 
 INPUT = "data/processed/permits_unified.parquet"
 OUTPUT = "scripts/visualization/output/monthly_volume.png"
 DATE_COL = "issued_date"
+# zlib level for the PNG encode; 1 roughly halves save time vs Pillow's default 6 for a larger file
+PNG_COMPRESS_LEVEL = 1
 
 
 def parse_dates(s: pd.Series) -> pd.Series:
-    s = s.astype("string").str.strip()
-    d1 = pd.to_datetime(s, format="%m/%d/%Y", errors="coerce")
-    d2 = pd.to_datetime(s, format="%Y-%m-%d", errors="coerce")
-    d3 = pd.to_datetime(s, errors="coerce")
-    return d1.fillna(d2).fillna(d3)
-
-
-df = pd.read_parquet(INPUT, columns=[DATE_COL])
-df[DATE_COL] = parse_dates(df[DATE_COL])
-df = df.dropna(subset=[DATE_COL])
-
-df["month"] = df[DATE_COL].dt.to_period("M").dt.to_timestamp()
-
-max_date = df[DATE_COL].max()
-max_month_start = max_date.to_period("M").to_timestamp()
-max_month_end = max_month_start + pd.offsets.MonthEnd(0)
-last_complete = max_month_start - pd.DateOffset(months=1) if max_date < max_month_end else max_month_start
-
-df = df[df["month"] <= last_complete]
-
-monthly = df.groupby("month").size().rename("permits").to_frame()
-monthly["ma12"] = monthly["permits"].rolling(12, min_periods=12).mean()
-
-plt.style.use("dark_background")
-fig, ax = plt.subplots(figsize=(12, 5))
-fig.patch.set_facecolor("#111111")
-ax.set_facecolor("#111111")
-ax.plot(monthly.index, monthly["permits"], color="white", alpha=0.25, label="Total permits issued")
-ax.plot(monthly.index, monthly["ma12"], color="#7A00FF", linewidth=2.0, label="Total permits 12-mo rolling")
-ax.set_title("Monthly Permit Volume")
-ax.set_xlabel("Month")
-ax.set_ylabel("Permit count")
-ax.grid(color="gray", alpha=0.3)
-# light year markers
-year_starts = pd.date_range(monthly.index.min(), monthly.index.max(), freq="YS")
-for d in year_starts:
-    ax.axvline(d, color="gray", alpha=0.25, linewidth=0.6)
-ax.legend()
-plt.tight_layout()
-plt.savefig(OUTPUT, dpi=150)
-plt.close(fig)
-
-print("saved:", OUTPUT)
+    # Arrow trim, then a single mixed-format pass (month-first for slash dates);
+    # measured faster than splitting on "/" and parsing each side with a fixed format
+    arr = pc.utf8_trim_whitespace(pa.array(s, type=pa.string(), from_pandas=True))
+    s = pd.Series(arr.to_pandas(types_mapper=pd.ArrowDtype), index=s.index)
+    out = pd.to_datetime(s, format="mixed", dayfirst=False, errors="coerce")
+    unparsed = int((out.isna() & s.notna()).sum())
+    if unparsed:
+        print("unparsed dates:", unparsed)
+    return out
+
+
+@njit(cache=True)
+def month_ordinal(t_ns):
+    """Months since 1970-01 for an epoch-nanosecond timestamp (proleptic Gregorian civil-from-days)."""
+    z = t_ns // 86_400_000_000_000 + 719_468
+    era = z // 146_097
+    doe = z - era * 146_097
+    yoe = (doe - doe // 1_460 + doe // 36_524 - doe // 146_096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    m = mp + 3 if mp < 10 else mp - 9
+    y = yoe + era * 400 + (1 if m <= 2 else 0)
+    return (y - 1970) * 12 + m - 1
+
+
+@njit(cache=True)
+def monthly_counts_ma12(ts_i64, first_month, n_months):
+    """One sweep over the timestamps: floor to month, count, then the trailing 12-month mean."""
+    counts = np.zeros(n_months, dtype=np.int64)
+    for t in ts_i64:
+        counts[month_ordinal(t) - first_month] += 1
+    ma12 = np.full(n_months, np.nan)
+    s = 0
+    for i in range(n_months):
+        s += counts[i]
+        if i >= 12:
+            s -= counts[i - 12]
+        if i >= 11:
+            ma12[i] = s / 12.0
+    return counts, ma12
+
+
+def max_date_from_stats(path: str, column: str):
+    """Global max of a timestamp column from row-group statistics, or None if unavailable."""
+    pf = pq.ParquetFile(path)
+    schema = pf.schema_arrow
+    if not pa.types.is_timestamp(schema.field(column).type):
+        return None
+    col_idx = schema.get_field_index(column)
+    maxes = []
+    for i in range(pf.num_row_groups):
+        rg = pf.metadata.row_group(i)
+        stats = rg.column(col_idx).statistics
+        # all-null row groups have no min/max written but contribute nothing either
+        if stats is not None and not stats.has_min_max and stats.null_count == rg.num_rows:
+            continue
+        if stats is None or not stats.has_min_max:
+            return None
+        maxes.append(stats.max)
+    return np.datetime64(max(maxes), "ns") if maxes else None
+
+
+def monthly_volume():
+    """(month_index, counts, ma12) for complete months, computed on bare datetime64/int64 ndarrays."""
+    # Footer-only pass: a typed date column lets us find the cutoff without reading rows
+    stats_max = max_date_from_stats(INPUT, DATE_COL)
+    if stats_max is not None:
+        max_date = stats_max
+    else:
+        # legacy text dates (or a file written without statistics): read and parse the full column
+        col = pd.read_parquet(INPUT, columns=[DATE_COL])[DATE_COL]
+        if not pd.api.types.is_datetime64_dtype(col):
+            col = parse_dates(col)
+        dates = col.to_numpy("datetime64[ns]")
+        dates = dates[~np.isnat(dates)]
+        max_date = dates.max()
+
+    # max_date is a numpy datetime64 on both paths, so month arithmetic stays on datetime64[M];
+    # max_month_end is the last day of the month at midnight
+    max_month = max_date.astype("datetime64[M]")
+    max_month_end = (max_month + 1).astype("datetime64[D]") - np.timedelta64(1, "D")
+    last_month = max_month - 1 if max_date < max_month_end else max_month
+    # exclusive upper bound on raw dates, so months are only derived for rows we keep
+    cutoff = (last_month + 1).astype("datetime64[ns]")
+
+    if stats_max is not None:
+        # pushdown: row groups entirely past the cutoff are skipped via their statistics
+        dataset = ds.dataset(INPUT, format="parquet")
+        cutoff_scalar = pa.scalar(pd.Timestamp(cutoff), type=dataset.schema.field(DATE_COL).type)
+        dates = (
+            dataset.to_table(columns=[DATE_COL], filter=ds.field(DATE_COL) < cutoff_scalar)[DATE_COL]
+            .to_numpy()
+            .astype("datetime64[ns]", copy=False)
+        )
+    else:
+        dates = dates[dates < cutoff]
+
+    # floor, count and rolling mean are one fused kernel over the int64 view
+    first_month = dates.min().astype("datetime64[M]")
+    counts, ma12 = monthly_counts_ma12(
+        dates.view(np.int64), first_month.astype(np.int64), int((last_month - first_month).astype(np.int64)) + 1
+    )
+    month_index = np.arange(first_month, last_month + 1).astype("datetime64[ns]")
+    return month_index, counts, ma12
+
+
+def plot_monthly_volume(month_index, counts, ma12):
+    # pandas only for the plotted table: a DatetimeIndex x-axis is convenient for matplotlib
+    monthly = pd.DataFrame({"permits": counts, "ma12": ma12}, index=pd.DatetimeIndex(month_index, name="month"))
+
+    plt.style.use("dark_background")
+    fig, ax = plt.subplots(figsize=(12, 5))
+    fig.patch.set_facecolor("#111111")
+    ax.set_facecolor("#111111")
+    (line_raw,) = ax.plot(
+        monthly.index, monthly["permits"], color="white", alpha=0.25, label="Total permits issued"
+    )
+    # faint background series goes out as pixels; the MA line stays vector
+    line_raw.set_rasterized(True)
+    ax.plot(monthly.index, monthly["ma12"], color="#7A00FF", linewidth=2.0, label="Total permits 12-mo rolling")
+    ax.set_title("Monthly Permit Volume")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Permit count")
+    ax.grid(color="gray", alpha=0.3)
+    # light year markers
+    year_starts = pd.date_range(monthly.index.min(), monthly.index.max(), freq="YS")
+    # one collection spanning the full axes height (x in data, y in axes coords), like axvline
+    year_x = mdates.date2num(year_starts)
+    ax.add_collection(
+        LineCollection(
+            [[(x, 0), (x, 1)] for x in year_x],
+            colors="gray",
+            alpha=0.25,
+            linewidths=0.6,
+            transform=ax.get_xaxis_transform(),
+        ),
+        autolim=False,
+    )
+    ax.legend()
+    # fixed margins for the 12x5 figure instead of a post-hoc tight_layout pass
+    fig.subplots_adjust(left=0.07, right=0.98, top=0.92, bottom=0.12)
+    # 12x5 in at 150 dpi is the final 1800x750 canvas: no bbox recomputation or second draw on save
+    fig.savefig(
+        OUTPUT,
+        dpi=150,
+        bbox_inches=None,
+        pad_inches=0,
+        facecolor=fig.get_facecolor(),
+        metadata={"Software": "plot_permits_overview"},
+        pil_kwargs={"optimize": False, "compress_level": PNG_COMPRESS_LEVEL},
+    )
+    plt.close(fig)
+
+
+def main():
+    month_index, counts, ma12 = monthly_volume()
+    plot_monthly_volume(month_index, counts, ma12)
+    print("saved:", OUTPUT)
+    return month_index, counts, ma12
+
+
+if __name__ == "__main__":
+    main()